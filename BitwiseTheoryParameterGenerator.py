@@ -8,27 +8,21 @@
 import random
 
 bits    = 64 # 64, 32, or 16
-i       = 0
 
-raw_numerical		= ""
-byte_array          = ""
-unsigned_numerical  = "0b"
+# draw every bit as a single integer rather than one digit at a time
+number				= random.getrandbits(bits)
+raw_numerical		= format(number, f"0{bits}b")
+byte_array          = []
+unsigned_numerical  = []
 
-for i in range(0, bits):
-	digit = str(random.randint(0, 1))
-	raw_numerical += digit
-	if i % 8 == 0:
-		unsigned_numerical += "_"
-	unsigned_numerical += digit
-	i += 1
+for i in range(0, bits, 8):
+	unsigned_numerical.append(raw_numerical[i:i + 8])
 
-print(unsigned_numerical)
+print("0b_" + "_".join(unsigned_numerical))
 print("\n")
 
-for i in range(0, int(bits / 8)):
-	byte_array += ", 0b_"
-	for x in range(bits - ((i + 1) * 8), bits - ((i + 1) * 8) + 8):
-		byte_array += raw_numerical[x]
-	i += 1
+# little endian, the least significant byte comes first
+for byte in number.to_bytes(bits // 8, "little"):
+	byte_array.append(f"0b_{byte:08b}")
 
-print(byte_array.removeprefix(", "))
\ No newline at end of file
+print(", ".join(byte_array))
\ No newline at end of file
@@ -3,8 +3,10 @@
 # Licensed under the MIT License
 
 import os
+import re
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 HEADER_START_TAG 	= '>>>HEADER_START<<<'
 HEADER_END_TAG 		= '>>>HEADER_END<<<'
@@ -13,6 +15,7 @@ FOOTER_END_TAG 		= '>>>FOOTER_END<<<'
 
 FILE_NAME_TAG		= '{FILE_NAME}'
 FOLDER_NAME_TAG		= '{FOLDER_NAME}'
+TAG_PATTERN			= re.compile(r'(\{FILE_NAME\}|\{FOLDER_NAME\})')
 
 NO_HEADER_OR_FOOTER_MESSAGE = 'No header nor footer given form either command line arguments or file.'
 
@@ -21,6 +24,9 @@ HAS_HEADER 				= 1
 HAS_FOOTER 				= 2
 HAS_HEADER_AND_FOOTER 	= 4
 
+# extra bytes read before the footer to allow for trailing whitespace
+FOOTER_READ_ALLOWANCE 	= 64
+
 def print_header_file_help():
 	print(f'''
 		  To make a header/footer file you must include at least one header or footer block, 
@@ -37,40 +43,141 @@ def print_header_file_help():
 		  \t{FOLDER_NAME}: Inserts the name of the current file's folder.
 		  ''')
 
+def uses_crlf(file):
+	# files are read as bytes, so unlike text mode '\r\n' isn't translated, the 
+	# first line's ending is taken as the newline style of the whole file
+	file.seek(0)
+	return file.readline().endswith(b'\r\n')
+
+def has_header_and_footer(file, header, footer):
+	# only the start and end of the file are read, so files which already have 
+	# both don't need to be loaded in full just to be skipped, returning False 
+	# only means a full read is needed to be sure
+	size = file.seek(0, os.SEEK_END)
+	if size < len(header) + len(footer):
+		return False
+
+	file.seek(0)
+	if file.read(len(header)) != header:
+		return False
+
+	file.seek(max(size - len(footer) - FOOTER_READ_ALLOWANCE, len(header)))
+	return file.read().rstrip().endswith(footer)
+
+def fill_folder_name(template_parts, folder_name):
+	# takes a template split by TAG_PATTERN, inserts the folder name and returns 
+	# the encoded pieces which go between each occurrence of the file name
+	pieces = ['']
+
+	for index, part in enumerate(template_parts):
+		if index % 2 == 0:
+			pieces[-1] += part
+		elif part == FILE_NAME_TAG:
+			pieces.append('')
+		else:
+			pieces[-1] += folder_name
+
+	return [piece.encode('utf-8', 'surrogateescape') for piece in pieces]
+
 def apply_footers_and_headers(files, paths, disable_tags, detect_header):
-	for file_path in paths:
+	# files are handled as raw bytes, so the header/footer are encoded up front 
+	# instead of decoding and re-encoding every file
+	encoded_header 	= header.encode('utf-8', 'surrogateescape')
+	encoded_footer 	= footer.encode('utf-8', 'surrogateescape')
+
+	# the header/footer are scanned for tags once here, each file then only 
+	# needs the pieces between tags joined back together
+	header_parts 	= TAG_PATTERN.split(header)
+	footer_parts 	= TAG_PATTERN.split(footer)
+	has_tags 		= len(header_parts) > 1 or len(footer_parts) > 1
+
+	# the folder name only changes between directories, so the header/footer 
+	# with it filled in are kept per directory rather than rebuilt per file
+	folder_tagged = {}
+
+	def tag_folder(folder_path):
+		if folder_path not in folder_tagged:
+			folder_name = os.path.basename(folder_path)
+			folder_tagged[folder_path] = (fill_folder_name(header_parts, folder_name), fill_folder_name(footer_parts, folder_name))
+
+		return folder_tagged[folder_path]
+
+	def apply_footer_and_header(file_name, file_path):
 		try: 
-			current_file = open(file_path, 'r+', encoding = 'utf-8', errors = 'ignore')
+			current_file = open(file_path, 'rb+')
 		except PermissionError: 
-			print(f'Skipped {file_path}: Insufficiant Permissions ...')
-			continue
+			return f'Skipped {file_path}: Insufficiant Permissions ...'
 		
-		tagged_header = header
-		tagged_footer = footer
-
-		if disable_tags != True:
-			tagged_header = tagged_header.replace(FILE_NAME_TAG, files[paths.index(file_path)])
-			tagged_footer = tagged_footer.replace(FILE_NAME_TAG, files[paths.index(file_path)])
-			tagged_header = tagged_header.replace(FOLDER_NAME_TAG, os.path.basename(os.path.dirname(file_path)))
-			tagged_footer = tagged_footer.replace(FOLDER_NAME_TAG, os.path.basename(os.path.dirname(file_path)))
-
-		content = current_file.read().strip()
-
-		if detect_header:
-			if content.find(tagged_header) == 0 and content.find(tagged_footer) == len(content) - len(tagged_footer) and content != '':
-				continue
-			elif content.find(tagged_footer) == len(content) - len(tagged_footer) and content != '' and tagged_header != '':
-				current_file.seek(0)
-				current_file.write(tagged_header + content)
-			elif content.find(tagged_header) == 0 and tagged_footer != '':
-				current_file.seek(0)
-				current_file.write(content + tagged_footer)
+		with current_file:
+			# nothing is written unless existing headers/footers are being 
+			# detected, so otherwise the file isn't read at all
+			if not detect_header:
+				return f'Added Header/Footer to {file_path} ...'
+
+			tagged_header = encoded_header
+			tagged_footer = encoded_footer
+
+			if disable_tags != True and has_tags:
+				header_pieces, footer_pieces = tag_folder(os.path.dirname(file_path))
+				encoded_file_name = file_name.encode('utf-8', 'surrogateescape')
+				tagged_header = encoded_file_name.join(header_pieces)
+				tagged_footer = encoded_file_name.join(footer_pieces)
+
+			# the header/footer are matched and written using the file's own line 
+			# endings so existing ones are found and no mixed endings are written
+			if uses_crlf(current_file):
+				tagged_header = tagged_header.replace(b'\n', b'\r\n')
+				tagged_footer = tagged_footer.replace(b'\n', b'\r\n')
+
+			if has_header_and_footer(current_file, tagged_header, tagged_footer):
+				return
+
+			current_file.seek(0)
+			content = current_file.read().strip()
+
+			if content.startswith(tagged_header) and content.endswith(tagged_footer) and content != b'':
+				return
+			elif content.endswith(tagged_footer) and content != b'' and tagged_header != b'':
+				new_content = (tagged_header, content)
+			elif content.startswith(tagged_header) and tagged_footer != b'':
+				new_content = (content, tagged_footer)
 			else:
-				current_file.seek(0)
-				current_file.write(tagged_header + content + tagged_footer)
-
-		print(f'Added Header/Footer to {file_path} ...')
-		current_file.close()
+				new_content = (tagged_header, content, tagged_footer)
+
+			# the pieces are written one after another rather than concatenated 
+			# so no second full size copy of the file is made in memory, and as 
+			# the stripped content may be shorter than what was in the file 
+			# anything left past the new end has to be cut off
+			current_file.seek(0)
+			current_file.writelines(new_content)
+			current_file.truncate()
+
+		return f'Added Header/Footer to {file_path} ...'
+
+	# each file is independent and the work is almost entirely I/O, 
+	# so files are handled on a thread pool rather than one at a time, 
+	# messages are printed here in file order instead of from the workers
+	with ThreadPoolExecutor(max_workers = min(32, (os.cpu_count() or 1) * 4)) as executor:
+		for message in executor.map(apply_footer_and_header, files, paths):
+			if message is not None:
+				print(message)
+
+def walk_directory(directory, extension):
+	# scandir() entries cache their type, so unlike os.walk() no extra 
+	# stat calls are made to tell files and directories apart, as with os.walk() 
+	# any directory which can't be read is skipped
+	try:
+		entries = os.scandir(directory)
+	except OSError:
+		return
+
+	with entries:
+		for entry in entries:
+			if entry.is_dir():
+				if not entry.is_symlink():
+					yield from walk_directory(entry.path, extension)
+			elif extension == '' or entry.name.endswith(extension):
+				yield entry
 
 parser = argparse.ArgumentParser(description = 'A small utility to add headers and footers to files.')
 
@@ -95,39 +202,24 @@ if args.header_file_help:
 extension			= args.extension
 dir					= args.directory
 header_file			= args.header_file
+script_name			= os.path.basename(sys.argv[0])
 header				= args.top
 footer				= args.bottom
-files 				= ['']
-paths 				= ['']
+files 				= []
+paths 				= []
 has_header_footer 	= -1
 
+# only files ending in the given extension (or every file if no extension 
+# was given) are collected, so no second pass is needed to filter them
 if args.recursive:
-	for current_directory, directories, current_files in os.walk(dir):
-		for file in current_files:
-			paths.append(os.path.join(current_directory, file))
-			files.append(file)
+	for entry in walk_directory(dir, extension):
+		paths.append(entry.path)
+		files.append(entry.name)
 else:
-	for file in os.scandir(dir):
-		paths.append(file.name)
-		files.append(file.name)
-
-valid_files = ['']
-valid_paths = ['']
-
-# Gets all files ending in any of the given extensions and adds them to 
-# valid_files and valid_paths, which are later used to set the value
-# of files and paths
-for file in files:
-	if file[len(file) - len(extension):] == extension:
-		valid_files.append(file)
-for path in paths:
-	if path[len(path) - len(extension):] == extension:
-		valid_paths.append(path)
-
-files = valid_files
-paths = valid_paths
-paths.remove('')
-files.remove('')
+	for entry in os.scandir(dir):
+		if extension == '' or entry.name.endswith(extension):
+			paths.append(entry.name)
+			files.append(entry.name)
 
 for path in paths:
 	print(path)
@@ -221,22 +313,17 @@ yn = input('Is this correct? [Y/n]: ')
 if yn.lower() != 'y' and yn != '':
 	sys.exit()
 
-if files.__contains__(os.path.basename(sys.argv[0])):
-	files.remove(os.path.basename(sys.argv[0])) # prevents this file from editing itself
-
-if files.__contains__(header_file):
-	files.remove(header_file) # prevents this file from editing the header file
-
-if paths.__contains__(os.path.basename(sys.argv[0])):
-	paths.remove(os.path.basename(sys.argv[0])) # prevents this file from editing itself
-
-if paths.__contains__(header_file):
-	paths.remove(header_file) # prevents this file from editing the header file
-
-if paths.__contains__(os.path.join(dir, os.path.basename(sys.argv[0]))):
-	paths.remove(os.path.join(dir, os.path.basename(sys.argv[0]))) # prevents this file from editing itself
-
-if paths.__contains__(os.path.join(dir, header_file)):
-	paths.remove(os.path.join(dir, header_file)) # prevents this file from editing the header file
+# prevents this file from editing itself or the header file, files and paths 
+# are filtered together so that they stay paired up
+excluded_paths = {
+	script_name,
+	header_file,
+	os.path.join(dir, script_name),
+	os.path.join(dir, header_file)
+}
+
+kept = [(file, path) for file, path in zip(files, paths) if path not in excluded_paths]
+files = [file for file, path in kept]
+paths = [path for file, path in kept]
 
 apply_footers_and_headers(files, paths, args.disable_tags, args.detect_header)
\ No newline at end of file